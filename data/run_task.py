@@ -1,68 +1,185 @@
 #!/usr/bin/env python3
 import argparse
+import functools
 import json
-import logging
 import os
-import subprocess
 import sys
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+# logging, subprocess and friends are imported where they are used, so that
+# skipping an already-completed task (the common case on re-runs) only pays
+# for argparse and the state file
+
+# orjson is optional; fall back to the stdlib encoder when it isn't installed
+try:
+    import orjson
+
+    def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+        return json.dumps(obj, indent=2 if indent else None).encode()
+
+    _json_loads = json.loads
+
+# Always use /docker-workspace/config/install
+INSTALL_DIR = Path("/docker-workspace/config/install")
+CACHE_DIR = INSTALL_DIR / ".cache"
+LOG_DIR = CACHE_DIR / "logs"
+
+# fdatasync is Linux-only; fall back to a full fsync elsewhere
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+# Shared read-only default for missing task records
+_EMPTY: Dict[str, Any] = {}
+
+# Characters in task IDs that don't belong in log file names
+_LOG_NAME_TABLE = str.maketrans({' ': '_', '/': '-', '(': None, ')': None})
+
+
+def _log_name(task_id: str) -> str:
+    """File-name-safe form of a task ID, in a single translate() pass"""
+    return task_id.translate(_LOG_NAME_TABLE)
+
+
+def _read_bytes_if_exists(path: Path) -> bytes:
+    """Return the file's contents, or b"" if it doesn't exist"""
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return b""
+
 
 class StateManager:
-    """Manages deployment state for resume capability"""
+    """
+    Manages deployment state for resume capability.
+    
+    state.json is a snapshot. Non-terminal transitions (task started) are
+    appended to a small JSON-lines journal instead of rewriting the whole
+    snapshot; the journal is replayed on load and folded back into the
+    snapshot whenever a task completes or fails.
+    """
     
     def __init__(self):
-        # Always use /docker-workspace/config/install
-        self.state_file = Path("/docker-workspace/config/install/.cache/state.json")
-        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        self.state_file = CACHE_DIR / "state.json"
+        self.journal_file = CACHE_DIR / "state.log"
         self.state = self._load_state()
+        # Direct reference to the per-task records, used by every lookup
+        self._tasks = self.state.setdefault("tasks", {})
     
     def _load_state(self) -> Dict[str, Any]:
-        """Load existing state or create new"""
-        if self.state_file.exists():
-            with open(self.state_file, 'r') as f:
-                return json.load(f)
-        return {
-            "tasks": {},
-            "last_run": None,
-            "status": "not_started"
-        }
+        """Load existing state or create new, then replay the journal"""
+        # Read directly instead of exists() + open; a missing or empty file
+        # both mean "no state yet"
+        raw = _read_bytes_if_exists(self.state_file)
+        # The first snapshot creates a directory entry that also needs syncing
+        self._snapshot_is_new = not raw
+        if raw.strip():
+            # Both decoders accept bytes directly
+            state = _json_loads(raw)
+        else:
+            state = {
+                "tasks": {},
+                "last_run": None,
+                "status": "not_started"
+            }
+        
+        for line in _read_bytes_if_exists(self.journal_file).splitlines():
+            try:
+                record = _json_loads(line)
+            except ValueError:
+                # Torn final line from a crash mid-append
+                break
+            state["tasks"][record["task_id"]] = record["task"]
+            state["last_run"] = record["task_id"]
+        
+        return state
+    
+    def _append_journal(self, task_id: str):
+        """Record a task's current entry in the journal"""
+        record = {"task_id": task_id, "task": self._tasks[task_id]}
+        with open(self.journal_file, 'ab') as f:
+            f.write(_json_dumps(record) + b"\n")
     
     def _save_state(self):
-        """Persist state to disk"""
-        with open(self.state_file, 'w') as f:
-            json.dump(self.state, f, indent=2)
+        """Persist a full snapshot to disk and retire the journal"""
+        # Drop the journal first: a crash in between loses only entries that
+        # the in-flight snapshot would have carried anyway, never replays a
+        # stale "running" over a newer snapshot
+        try:
+            self.journal_file.unlink()
+        except FileNotFoundError:
+            pass
+        # Write a temp file and rename it over the snapshot so a crash
+        # mid-write never leaves a truncated state.json behind. Snapshots
+        # only happen on terminal transitions, so they are the one place
+        # worth forcing to disk; journal appends stay in the page cache.
+        # fdatasync skips the inode metadata flush that fsync also does.
+        tmp_file = self.state_file.with_suffix(".json.tmp")
+        with open(tmp_file, 'wb') as f:
+            f.write(_json_dumps(self.state, indent=True))
+            f.flush()
+            _fdatasync(f.fileno())
+        os.replace(tmp_file, self.state_file)
+        
+        if self._snapshot_is_new:
+            dir_fd = os.open(self.state_file.parent, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+            self._snapshot_is_new = False
     
     def is_completed(self, task_id: str) -> bool:
         """Check if task is already completed"""
-        return self.state["tasks"].get(task_id, {}).get("status") == "completed"
+        return self._tasks.get(task_id, _EMPTY).get("status") == "completed"
     
     def mark_started(self, task_id: str):
         """Mark task as started"""
-        self.state["tasks"][task_id] = {
+        self._tasks[task_id] = {
             "status": "running",
             "started_at": datetime.now().isoformat()
         }
         self.state["last_run"] = task_id
-        self._save_state()
+        self._append_journal(task_id)
     
     def mark_completed(self, task_id: str):
         """Mark task as completed"""
-        self.state["tasks"][task_id]["status"] = "completed"
-        self.state["tasks"][task_id]["completed_at"] = datetime.now().isoformat()
+        task = self._tasks[task_id]
+        task["status"] = "completed"
+        task["completed_at"] = datetime.now().isoformat()
         self._save_state()
     
     def mark_failed(self, task_id: str, error: str):
         """Mark task as failed"""
-        self.state["tasks"][task_id]["status"] = "failed"
-        self.state["tasks"][task_id]["error"] = error
-        self.state["tasks"][task_id]["failed_at"] = datetime.now().isoformat()
+        task = self._tasks[task_id]
+        task["status"] = "failed"
+        task["error"] = error
+        task["failed_at"] = datetime.now().isoformat()
         self._save_state()
     
-    def get_last_incomplete_task(self) -> Optional[str]:
-        """Get the last task that wasn't completed"""
-        return self.state.get("last_run")
+    def get_incomplete_tasks(self) -> List[str]:
+        """Get every task that was started but not completed, in one pass"""
+        return [
+            task_id for task_id, task in self._tasks.items()
+            if task.get("status") != "completed"
+        ]
+    
+    def get_last_incomplete_task(self, incomplete: List[str]) -> Optional[str]:
+        """Pick the most recent task from get_incomplete_tasks()'s result"""
+        if not incomplete:
+            return None
+        # last_run is kept after a task completes, so only trust it if
+        # that task is still incomplete
+        last_run = self.state.get("last_run")
+        if last_run is not None and self._tasks.get(last_run, _EMPTY).get("status") != "completed":
+            return last_run
+        return incomplete[-1]
 
 
 class TaskLogger:
@@ -75,25 +192,33 @@ class TaskLogger:
     RED = '\033[91m'
     NC = '\033[0m'  # No Color
     
-    def __init__(self, task_id: str):
-        self.task_id = task_id
+    # Pre-rendered banner borders and separator for the default width
+    BANNER_WIDTH = 68
+    BANNER_TOP = f"{CYAN}╔{'═' * (BANNER_WIDTH - 2)}╗{NC}"
+    BANNER_BOTTOM = f"{CYAN}╚{'═' * (BANNER_WIDTH - 2)}╝{NC}"
+    SEPARATOR = f"{CYAN}{'─' * BANNER_WIDTH}{NC}"
+    
+    def __init__(self, task_id: str, verbose: bool = False):
+        import atexit
+        import logging.handlers
+        import queue
         
-        # Setup log directory - always use install path
-        log_dir = Path("/docker-workspace/config/install/.cache/logs")
-        log_dir.mkdir(parents=True, exist_ok=True)
+        self.task_id = task_id
+        self.verbose = verbose
+        level = logging.DEBUG if verbose else logging.INFO
         
         # Setup logger
         self.logger = logging.getLogger(f"task.{task_id}")
-        self.logger.setLevel(logging.INFO)
+        self.logger.setLevel(level)
         
         # File handler for task-specific log
-        task_log = log_dir / f"{task_id}.log"
+        task_log = LOG_DIR / f"{_log_name(task_id)}.log"
         fh = logging.FileHandler(task_log)
-        fh.setLevel(logging.INFO)
+        fh.setLevel(level)
         
         # Console handler
         ch = logging.StreamHandler()
-        ch.setLevel(logging.INFO)
+        ch.setLevel(level)
         
         # Formatter
         formatter = logging.Formatter(
@@ -102,10 +227,20 @@ class TaskLogger:
         fh.setFormatter(formatter)
         ch.setFormatter(formatter)
         
-        self.logger.addHandler(fh)
+        # File writes go through a queue to a background thread so disk I/O
+        # doesn't stall the task; console output stays synchronous so it
+        # keeps its ordering relative to the banners printed below
+        log_queue = queue.Queue(-1)
+        self.listener = logging.handlers.QueueListener(log_queue, fh)
+        self.listener.start()
+        # Drain the queue before the interpreter shuts down
+        atexit.register(self.listener.stop)
+        
+        self.logger.addHandler(logging.handlers.QueueHandler(log_queue))
         self.logger.addHandler(ch)
     
-    def print_banner(self, title: str, width: int = 68):
+    @classmethod
+    def print_banner(cls, title: str, width: int = BANNER_WIDTH):
         """Print a fancy banner for task separation with centered text"""
         # Calculate padding for centered text
         content_width = width - 4  # Account for "║  " and "  ║"
@@ -121,72 +256,98 @@ class TaskLogger:
         right_padding = total_padding - left_padding
         
         # Build the banner
-        border = "═" * (width - 2)
-        print("")
-        print(f"{self.CYAN}╔{border}╗{self.NC}")
-        print(f"{self.CYAN}║ {' ' * left_padding}{title}{' ' * right_padding} ║{self.NC}")
-        print(f"{self.CYAN}╚{border}╝{self.NC}")
-        print("")
-    
-    def print_success(self, message: str):
+        if width == cls.BANNER_WIDTH:
+            top, bottom = cls.BANNER_TOP, cls.BANNER_BOTTOM
+        else:
+            border = "═" * (width - 2)
+            top = f"{cls.CYAN}╔{border}╗{cls.NC}"
+            bottom = f"{cls.CYAN}╚{border}╝{cls.NC}"
+        middle = f"{cls.CYAN}║ {' ' * left_padding}{title}{' ' * right_padding} ║{cls.NC}"
+        # One write instead of five
+        print(f"\n{top}\n{middle}\n{bottom}\n")
+    
+    @classmethod
+    def print_success(cls, message: str):
         """Print success message"""
-        print(f"{self.GREEN}✓ {message}{self.NC}")
+        print(f"{cls.GREEN}✓ {message}{cls.NC}")
     
-    def print_error(self, message: str):
+    @classmethod
+    def print_error(cls, message: str):
         """Print error message"""
-        print(f"{self.RED}✗ {message}{self.NC}")
+        print(f"{cls.RED}✗ {message}{cls.NC}")
     
-    def print_warning(self, message: str):
+    @classmethod
+    def print_warning(cls, message: str):
         """Print warning message"""
-        print(f"{self.YELLOW}⚠ {message}{self.NC}")
+        print(f"{cls.YELLOW}⚠ {message}{cls.NC}")
     
-    def print_separator(self):
+    @classmethod
+    def print_separator(cls):
         """Print a simple separator line"""
-        print(f"{self.CYAN}{'─' * 68}{self.NC}")
+        print(cls.SEPARATOR)
     
-    def info(self, msg: str):
-        self.logger.info(msg)
+    def debug(self, msg: str, *args):
+        self.logger.debug(msg, *args)
     
-    def error(self, msg: str):
-        self.logger.error(msg)
+    def info(self, msg: str, *args):
+        self.logger.info(msg, *args)
     
-    def warning(self, msg: str):
-        self.logger.warning(msg)
+    def error(self, msg: str, *args):
+        self.logger.error(msg, *args)
+    
+    def warning(self, msg: str, *args):
+        self.logger.warning(msg, *args)
 
 
 class TaskExecutor:
     """Executes different types of tasks"""
     
-    def __init__(self, logger: TaskLogger):
+    # Chunk size for teeing task output to the console and output log
+    OUTPUT_BUFSIZE = 64 * 1024
+    # Kernel pipe capacity requested for task output, so a chatty child
+    # (ansible -vvv) rarely blocks waiting for us to drain the pipe
+    PIPE_BUFSIZE = 1024 * 1024
+    # How often to check for the child exiting when pidfds are unavailable
+    EXIT_POLL = 0.1
+    # Seconds a timed-out task gets to exit after SIGTERM before SIGKILL
+    KILL_GRACE = 10
+    
+    def __init__(self, logger: TaskLogger, output_log: bool = False):
         self.logger = logger
+        # Tee task output to .cache/logs/<task-id>.output.log; the child then
+        # writes to a pipe instead of inheriting the terminal
+        self.output_log = output_log
         self.data_dir = Path("/docker-workspace/data")
-        self.install_dir = Path("/docker-workspace/config/install")
+        self.install_dir = INSTALL_DIR
+        # Resolved once; passed to every ansible-playbook invocation
+        self.inventory_file = str(self.install_dir / "inventory.yml")
+    
+    @functools.cached_property
+    def ansible_env(self) -> Dict[str, str]:
+        """Environment for ansible-playbook, built once per executor"""
+        env_vars = os.environ.copy()
+        env_vars['ANSIBLE_CONFIG'] = str(self.data_dir / 'ansible.cfg')
+        return env_vars
     
     def execute(self, task_id: str, kind: str, **kwargs):
         """Execute a task based on its kind"""
-        self.logger.info(f"Executing task: {task_id} (kind: {kind})")
+        self.logger.debug("Executing task: %s (kind: %s)", task_id, kind)
         
-        if kind == "ansible":
-            return self._execute_ansible(task_id, **kwargs)
-        elif kind == "shell":
-            return self._execute_shell(task_id, **kwargs)
-        else:
+        handler = self.HANDLERS.get(kind)
+        if handler is None:
             raise ValueError(f"Unknown task kind: {kind}")
+        return handler(self, task_id, **kwargs)
     
-    def _execute_ansible(self, task_id: str, hosts: str, file: str, args: str = "", **kwargs):
+    def _execute_ansible(self, task_id: str, hosts: str, file: str, args: str = "",
+                         timeout: Optional[float] = None, **kwargs):
         """Execute an Ansible playbook"""
-        # Set environment variables for subprocess
-        env_vars = os.environ.copy()
-        env_vars['ANSIBLE_CONFIG'] = str(self.data_dir / 'ansible.cfg')
+        import subprocess
         
         # Build ansible-playbook command
-        inventory_path = self.install_dir / "inventory.yml"
-        playbook_path = Path(file)
-        
         cmd = [
             'ansible-playbook',
-            '-i', str(inventory_path),
-            str(playbook_path),
+            '-i', self.inventory_file,
+            str(Path(file)),
             '-e', f'target_hosts={hosts}',
             '-e', f'env_name=install',  # Always use 'install' as env name
         ]
@@ -195,72 +356,270 @@ class TaskExecutor:
         if args:
             cmd.extend(args.split())
         
-        self.logger.info(f"Running: {' '.join(cmd)}")
+        self.logger.info("Running playbook: %s (hosts: %s)", file, hosts)
+        if self.logger.verbose:
+            import shlex
+            self.logger.debug("Command: %s", shlex.join(cmd))
         
         try:
-            result = subprocess.run(
-                cmd,
-                env=env_vars,
-                check=True,
-                text=True
-            )
-            self.logger.info(f"Task {task_id} completed successfully")
-            self.logger.info(result.stdout)
+            self._run(task_id, cmd, timeout=timeout, env=self.ansible_env)
+            self.logger.info("Task %s completed successfully", task_id)
             return True
         except subprocess.CalledProcessError as e:
-            self.logger.error(f"Task {task_id} failed with exit code {e.returncode}")
-            self.logger.error(e.stdout)
-            self.logger.error(e.stderr)
+            self.logger.error("Task %s failed with exit code %s", task_id, e.returncode)
             raise
     
-    def _execute_shell(self, task_id: str, command: str, **kwargs):
+    def _execute_shell(self, task_id: str, command: str, timeout: Optional[float] = None, **kwargs):
         """Execute a shell command"""
-        self.logger.info(f"Running shell command: {command}")
+        import subprocess
+        
+        self.logger.info("Running shell command: %s", command)
         
         try:
-            result = subprocess.run(
-                command,
-                shell=True,
-                check=True,
-                text=True
-            )
-            self.logger.info(f"Task {task_id} completed successfully")
-            self.logger.info(result.stdout)
+            self._run(task_id, command, timeout=timeout, shell=True)
+            self.logger.info("Task %s completed successfully", task_id)
             return True
         except subprocess.CalledProcessError as e:
-            self.logger.error(f"Task {task_id} failed with exit code {e.returncode}")
-            self.logger.error(e.stdout)
-            self.logger.error(e.stderr)
+            self.logger.error("Task %s failed with exit code %s", task_id, e.returncode)
             raise
+    
+    # Task kind -> handler dispatch table
+    HANDLERS = {
+        "ansible": _execute_ansible,
+        "shell": _execute_shell,
+    }
+    
+    def _run(self, task_id: str, cmd, timeout: Optional[float] = None, **kwargs):
+        """
+        Run a command on the caller's terminal, or teeing its output to the
+        task output log when that is enabled.
+        If timeout (seconds) elapses the command gets SIGTERM, then SIGKILL
+        after KILL_GRACE seconds, and is treated as failing with exit code
+        124, like coreutils timeout -k.
+        """
+        import signal
+        import subprocess
+        
+        if self.output_log:
+            kwargs.update(stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        
+        # Anything already printed must reach the console before the child's output
+        sys.stdout.flush()
+        
+        deadline = time.monotonic() + timeout if timeout else None
+        # Normally the child shares our session and process group, so a
+        # terminal Ctrl-C or hangup reaches it directly. With a timeout it
+        # gets its own group (still in our session) so the timeout can
+        # signal everything it started, e.g. make under "sh -c"
+        own_group = deadline is not None
+        if own_group:
+            kwargs["preexec_fn"] = os.setpgrp
+        with subprocess.Popen(cmd, **kwargs) as process:
+            try:
+                if self.output_log:
+                    self._tee_output(task_id, process, deadline, timeout)
+                # Output is done (or inherited) but the child may still be running
+                process.wait(timeout=_remaining(deadline))
+            except subprocess.TimeoutExpired:
+                self.logger.error("Task %s timed out after %ss", task_id, timeout)
+                self._terminate_group(process)
+                raise subprocess.CalledProcessError(124, cmd) from None
+            except KeyboardInterrupt:
+                # Let the child shut down cleanly (release locks, save state).
+                # It already got the terminal's SIGINT unless it has its own
+                # group, in which case pass it on
+                if own_group:
+                    _signal_group(process.pid, signal.SIGINT)
+                process.wait()
+                raise
+            except BaseException:
+                if own_group:
+                    _signal_group(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+                raise
+        
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+    
+    def _terminate_group(self, process):
+        """SIGTERM the child's process group, then SIGKILL it after KILL_GRACE"""
+        import signal
+        import subprocess
+        
+        _signal_group(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=self.KILL_GRACE)
+        except subprocess.TimeoutExpired:
+            _signal_group(process.pid, signal.SIGKILL)
+    
+    def _tee_output(self, task_id: str, process, deadline: Optional[float], timeout: Optional[float]):
+        """
+        Copy the child's piped output to the console and the task output log
+        until it exits. Raises subprocess.TimeoutExpired once deadline passes.
+        """
+        import selectors
+        import subprocess
+        
+        output_log = LOG_DIR / f"{_log_name(task_id)}.output.log"
+        self.logger.debug("Output log: %s", output_log)
+        console_fd = sys.stdout.fileno()
+        
+        # Tee raw bytes between file descriptors in large chunks, bypassing
+        # the text/buffered I/O layers; os.read returns whatever is available
+        # so the console still updates in real time
+        # Append so output from earlier (failed) attempts survives a retry;
+        # O_APPEND also keeps each write atomic at the end of the file
+        log_fd = os.open(output_log, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        exit_fd = None
+        try:
+            _write_all(log_fd, f"===== {datetime.now().isoformat(timespec='seconds')} =====\n".encode())
+            with selectors.DefaultSelector() as selector:
+                pipe_fd = process.stdout.fileno()
+                _grow_pipe(pipe_fd, self.PIPE_BUFSIZE)
+                selector.register(pipe_fd, selectors.EVENT_READ)
+                # Also wake up when the child exits: background jobs that
+                # inherited stdout can hold the pipe open long after it
+                exit_fd = _open_pidfd(process.pid)
+                if exit_fd is not None:
+                    selector.register(exit_fd, selectors.EVENT_READ)
+                while True:
+                    # Wait for output with the deadline in force, so a
+                    # command that hangs without writing still times out
+                    remaining = _remaining(deadline)
+                    if remaining is not None and remaining <= 0:
+                        raise subprocess.TimeoutExpired(process.args, timeout)
+                    if exit_fd is None:
+                        # No pidfd: poll for the child exiting instead
+                        remaining = self.EXIT_POLL if remaining is None else min(remaining, self.EXIT_POLL)
+                    events = selector.select(remaining)
+                    if process.poll() is not None:
+                        # Take what's already in the pipe, but don't wait
+                        # for anything the child left behind to close it
+                        for chunk in _read_available(pipe_fd, self.OUTPUT_BUFSIZE, self.PIPE_BUFSIZE):
+                            _write_all(console_fd, chunk)
+                            _write_all(log_fd, chunk)
+                        return
+                    if not events:
+                        continue
+                    chunk = os.read(pipe_fd, self.OUTPUT_BUFSIZE)
+                    if not chunk:
+                        return
+                    _write_all(console_fd, chunk)
+                    _write_all(log_fd, chunk)
+        finally:
+            if exit_fd is not None:
+                os.close(exit_fd)
+            os.close(log_fd)
 
 
-def main():
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until deadline, or None when there is no deadline"""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _signal_group(pgid: int, sig: int):
+    """Signal a whole process group, ignoring one that is already gone"""
+    try:
+        os.killpg(pgid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def _open_pidfd(pid: int) -> Optional[int]:
+    """An fd that becomes readable when pid exits, or None if unsupported"""
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        # Python < 3.9 or Linux < 5.3
+        return None
+
+
+def _read_available(fd: int, bufsize: int, limit: int):
+    """Yield up to limit bytes already buffered in a pipe, without blocking"""
+    os.set_blocking(fd, False)
+    while limit > 0:
+        try:
+            chunk = os.read(fd, min(bufsize, limit))
+        except BlockingIOError:
+            return
+        if not chunk:
+            return
+        limit -= len(chunk)
+        yield chunk
+
+
+def _grow_pipe(fd: int, size: int):
+    """Best-effort resize of a pipe's kernel buffer (Linux only)"""
+    import fcntl
+    
+    # F_SETPIPE_SZ is only exposed by name from Python 3.10
+    try:
+        fcntl.fcntl(fd, getattr(fcntl, "F_SETPIPE_SZ", 1031), size)
+    except OSError:
+        # Not Linux, or above /proc/sys/fs/pipe-max-size; keep the default
+        pass
+
+
+def _write_all(fd: int, data: bytes):
+    """Write all of data to fd, retrying on short writes"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser"""
     parser = argparse.ArgumentParser(description='Run deployment tasks with state management')
     parser.add_argument('--task-id', help='Task ID to execute')
-    parser.add_argument('--kind', help='Task kind (ansible, shell)')
+    parser.add_argument('--kind', type=str.lower, choices=sorted(TaskExecutor.HANDLERS),
+                        help='Task kind (ansible, shell)')
     parser.add_argument('--hosts', help='Target hosts for ansible')
     parser.add_argument('--file', help='Ansible playbook file path')
     parser.add_argument('--args', default='', help='Additional arguments')
     parser.add_argument('--command', help='Shell command to execute')
+    parser.add_argument('--timeout', type=float, help='Kill the task after this many seconds')
     parser.add_argument('--resume', action='store_true', help='Resume from last checkpoint')
+    parser.add_argument('--output-log', action='store_true',
+                        help='Also save task output to .cache/logs/<task-id>.output.log '
+                             '(the task then writes to a pipe, not the terminal)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Show debug-level task details')
+    
+    return parser
+
+
+# Built once at import so main() only has to parse
+_PARSER = _build_parser()
+
+
+def main():
+    args = _PARSER.parse_args()
     
-    args = parser.parse_args()
+    # Create .cache and .cache/logs in one go before anything writes there
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
     
     # Initialize state manager
     state = StateManager()
     
+    # Skip completed tasks before setting up logging and the executor
+    if args.task_id and not args.resume and state.is_completed(args.task_id):
+        TaskLogger.print_banner(f"Task: {args.task_id}")
+        print(f"Task already completed, skipping...")
+        return 0
+    
     # Initialize logger
-    logger = TaskLogger(args.task_id or "setup")
+    logger = TaskLogger(args.task_id or "setup", verbose=args.verbose)
     
     # Handle resume
     if args.resume:
-        last_task = state.get_last_incomplete_task()
-        if not last_task:
+        incomplete = state.get_incomplete_tasks()
+        if not incomplete:
             logger.print_banner("Resume Check")
             print("No incomplete tasks to resume")
             return 0
         logger.print_banner("Resume Failed")
-        logger.print_error(f"Cannot auto-resume - please run the failed task manually: {last_task}")
+        print(f"{len(incomplete)} incomplete task(s): {', '.join(incomplete)}")
+        logger.print_error(f"Cannot auto-resume - please run the failed task manually: {state.get_last_incomplete_task(incomplete)}")
         return 1
     
     # Validate task parameters
@@ -268,17 +627,17 @@ def main():
         logger.print_error("--task-id is required")
         return 1
     
-    # Check if already completed
-    if state.is_completed(args.task_id):
-        logger.print_banner(f"Task: {args.task_id}")
-        print(f"Task already completed, skipping...")
-        return 0
+    # Check the playbook once, before the task is marked as started, so a
+    # bad path fails fast without leaving a "running" entry in state
+    if args.kind == "ansible" and not (args.file and Path(args.file).is_file()):
+        logger.print_error(f"Playbook not found: {args.file}")
+        return 1
     
     # Print task banner
     logger.print_banner(f"Executing Task: {args.task_id}")
     
     # Initialize executor
-    executor = TaskExecutor(logger)
+    executor = TaskExecutor(logger, output_log=args.output_log)
     
     # Mark task as started
     state.mark_started(args.task_id)
@@ -291,7 +650,8 @@ def main():
             hosts=args.hosts,
             file=args.file,
             args=args.args,
-            command=args.command
+            command=args.command,
+            timeout=args.timeout
         )
         
         # Mark as completed
@@ -15,11 +15,13 @@ Features:
 """
 
 import argparse
+import os
 import shutil
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 
 # Paths
@@ -42,6 +44,12 @@ FIRST_RUN_MARKER = f"{CONTAINER_INSTALL_DIR}/.initialized"
 # Scripts directory
 SCRIPTS_DIR = SCRIPT_DIR / "scripts"
 
+# Container runtimes in order of preference, with their volume mount options
+CONTAINER_RUNTIMES = (
+    ("podman", "rw,Z"),
+    ("docker", "rw"),
+)
+
 
 class Colors:
     """ANSI color codes for terminal output."""
@@ -91,20 +99,31 @@ def detect_container_runtime() -> Tuple[str, str]:
     Detect if podman or docker is available.
     Returns (runtime_name, selinux_option).
     """
-    if shutil.which("podman"):
-        return ("podman", "rw,Z")
-    elif shutil.which("docker"):
-        return ("docker", "rw")
-    else:
-        die("Neither podman nor docker found in PATH")
+    for runtime, selinux_opt in CONTAINER_RUNTIMES:
+        if shutil.which(runtime):
+            return (runtime, selinux_opt)
+
+    die("Neither podman nor docker found in PATH")
+
+
+def scan_script_dir() -> Dict[str, os.DirEntry]:
+    """
+    List the script directory once.
+    Returns a mapping of entry name to DirEntry for existence checks.
+    """
+    with os.scandir(SCRIPT_DIR) as entries:
+        return {entry.name: entry for entry in entries}
 
 
-def find_deployment_file() -> Optional[Path]:
+def find_deployment_file(entries: Dict[str, os.DirEntry]) -> Optional[Path]:
     """
-    Find a *.deployment.yml file in the script directory.
+    Find a *.deployment.yml file among the script directory entries.
     Returns the deployment file path or None if not found.
     """
-    deployment_files = list(SCRIPT_DIR.glob("*.deployment.yml"))
+    deployment_files = [
+        Path(entry.path) for name, entry in entries.items()
+        if name.endswith(".deployment.yml") and entry.is_file()
+    ]
 
     if not deployment_files:
         return None
@@ -112,7 +131,8 @@ def find_deployment_file() -> Optional[Path]:
     if len(deployment_files) == 1:
         return deployment_files[0]
 
-    # Multiple files - prompt user
+    # Multiple files - prompt user (order only matters for the menu)
+    deployment_files.sort()
     print()
     print(f"{Colors.BOLD}Multiple deployment files found:{Colors.ENDC}")
     print()
@@ -146,18 +166,49 @@ def extract_env_name(deployment_file: Path) -> str:
     return deployment_file.stem.replace('.deployment', '')
 
 
+def read_deployment_section(deployment_file: Path) -> str:
+    """
+    Return the raw text of the top-level 'deployment:' block.
+    Stops reading at the next top-level key, so the (much larger) network,
+    host and cluster sections are never read or parsed.
+    """
+    lines = []
+
+    with open(deployment_file, 'r') as f:
+        for line in f:
+            top_level = line[:1] not in ('', ' ', '\t', '\n', '#')
+            if lines and top_level:
+                break
+            if lines or line.startswith('deployment:'):
+                lines.append(line)
+
+    return ''.join(lines)
+
+
 def get_deployment_metadata(deployment_file: Path) -> dict:
     """
     Read deployment file and extract metadata (type, version, onboarder_version).
     Returns dict with deployment_type and onboarder_version.
     """
-    import yaml
-
     try:
-        with open(deployment_file, 'r') as f:
-            data = yaml.safe_load(f)
+        section = read_deployment_section(deployment_file)
+        data = {}
+
+        # Only pay for the PyYAML import when there is something to parse
+        if section:
+            import yaml
 
-        deployment = data.get('deployment', {})
+            # Prefer the libyaml-backed loader when PyYAML was built with it
+            loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+            try:
+                data = yaml.load(section, Loader=loader) or {}
+            except yaml.YAMLError:
+                # The block may refer to anchors defined elsewhere in the
+                # file; fall back to parsing the whole document
+                with open(deployment_file, 'r') as f:
+                    data = yaml.load(f, Loader=loader) or {}
+
+        deployment = data.get('deployment') or {}
 
         return {
             'deployment_type': deployment.get('type', 'basekit'),
@@ -257,19 +308,22 @@ def run_interactive_shell(
     selinux_opt: str,
     image_ref: str,
     deployment_file: Path,
-    metadata: dict
+    metadata: dict,
+    status: Optional[str] = None
 ) -> int:
     """
     Run the onboarder container in interactive mode.
     If container exists, attach to it. Otherwise create new one.
     Always ends up in /docker-workspace/config/install.
+    Pass status when the caller already queried it to skip a second lookup.
     Returns the exit code.
     """
     container_name = "onboarder"
     env_name = extract_env_name(deployment_file)
 
     # Check container status
-    status = get_container_status(runtime, container_name)
+    if status is None:
+        status = get_container_status(runtime, container_name)
 
     if status == 'running':
         # Container is running, exec into it at the install directory
@@ -373,11 +427,13 @@ def run_interactive_shell(
 
         # Mount the first-run script from scripts directory
         first_run_script_path = SCRIPTS_DIR / "first-run.sh"
-        if not first_run_script_path.exists():
+        try:
+            first_run_mode = first_run_script_path.stat().st_mode
+        except FileNotFoundError:
             die(f"First-run script not found: {first_run_script_path}")
         
         # Ensure script is executable
-        if not first_run_script_path.stat().st_mode & 0o111:
+        if not first_run_mode & 0o111:
             print_info("Making first-run script executable...")
             first_run_script_path.chmod(0o755)
 
@@ -465,29 +521,38 @@ Examples:
 
     args = parser.parse_args()
 
-    # Verify directories exist
-    if not DATA_DIR.exists():
+    # Verify directories exist (one directory listing instead of a stat each)
+    script_dir_entries = scan_script_dir()
+
+    if DATA_DIR.name not in script_dir_entries:
         die(f"Data directory not found: {DATA_DIR}")
 
-    if not IMAGES_DIR.exists():
+    if IMAGES_DIR.name not in script_dir_entries:
         die(f"Images directory not found: {IMAGES_DIR}")
 
-    if not SCRIPTS_DIR.exists():
+    if SCRIPTS_DIR.name not in script_dir_entries:
         die(f"Scripts directory not found: {SCRIPTS_DIR}")
 
     # Detect container runtime
     runtime, selinux_opt = detect_container_runtime()
     print_info(f"Using runtime: {runtime}")
 
+    # Probe the container state in the background so the runtime query
+    # overlaps with deployment file selection (which may prompt the user)
+    probe = ThreadPoolExecutor(max_workers=1)
+    status_future = probe.submit(get_container_status, runtime, "onboarder")
+    probe.shutdown(wait=False)
+
     # Find deployment file
     if args.deployment:
         # Explicit deployment file specified
-        if not args.deployment.exists():
+        try:
+            deployment_file = args.deployment.resolve(strict=True)
+        except FileNotFoundError:
             die(f"Deployment file not found: {args.deployment}")
-        deployment_file = args.deployment.resolve()
     else:
         # Auto-detect deployment file
-        deployment_file = find_deployment_file()
+        deployment_file = find_deployment_file(script_dir_entries)
 
         if not deployment_file:
             print()
@@ -510,7 +575,7 @@ Examples:
     metadata = get_deployment_metadata(deployment_file)
 
     # Check if container already exists
-    status = get_container_status(runtime, "onboarder")
+    status = status_future.result()
 
     if status != 'none':
         # Container exists, we'll attach/start it
@@ -561,7 +626,8 @@ Examples:
         selinux_opt=selinux_opt,
         image_ref=image_ref,
         deployment_file=deployment_file,
-        metadata=metadata
+        metadata=metadata,
+        status=status
     )
 
     return exit_code